@@ -1,4 +1,5 @@
 import { createClient } from "@/lib/supabase/server";
+import { invalidateReciterCache } from "@/lib/supabase/reciterCache";
 import { NextResponse } from "next/server";
 import crypto from "crypto";
 
@@ -95,6 +96,9 @@ export async function POST(request: Request) {
       throw new Error(`Failed to create reciter: ${insertError.message}`);
     }
     
+    // Make the new reciter visible to the matching routes right away
+    invalidateReciterCache();
+    
     return NextResponse.json({
       success: true,
       reciterId: reciterData.id,
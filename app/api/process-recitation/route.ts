@@ -1,5 +1,6 @@
 import { NextResponse } from 'next/server';
 import { createClient } from '@/lib/supabase/server';
+import { getReciters } from '@/lib/supabase/reciterCache';
 import { runPredictSpeaker } from '@/lib/api/runpod';
 
 export const maxDuration = 300; // Allow 5 minutes for RunPod cold starts
@@ -41,9 +42,7 @@ export async function POST(request: Request) {
     
     try {
       const supabase = await createClient();
-      const result = await supabase
-        .from('reciters')
-        .select('id, name, style, sample_audio_url');
+      const result = await getReciters(supabase);
       reciters = result.data;
       reciterError = result.error;
     } catch (dbError) {
@@ -58,9 +57,10 @@ export async function POST(request: Request) {
     // Create matches from predictions
     const matches = predictionData.predictions.map((prediction: any, index: number) => {
       // Find matching reciter in database by style/name
+      const speaker = prediction.speaker.toLowerCase();
       const matchingReciter = reciters?.find((reciter: any) => 
-        reciter.style?.toLowerCase().includes(prediction.speaker.toLowerCase()) ||
-        reciter.name.toLowerCase().includes(prediction.speaker.toLowerCase())
+        reciter.style?.toLowerCase().includes(speaker) ||
+        reciter.name.toLowerCase().includes(speaker)
       );
       
       return {
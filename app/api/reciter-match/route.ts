@@ -1,4 +1,5 @@
 import { createClient } from '@/lib/supabase/server';
+import { getReciters } from '@/lib/supabase/reciterCache';
 import { NextResponse } from "next/server";
 
 export async function POST(request: Request) {
@@ -41,10 +42,8 @@ export async function POST(request: Request) {
     const predictionData = await predictionResponse.json();
     
     // Get all reciters from database to match against
-    const supabase = createClient();
-    const { data: reciters, error: reciterError } = await supabase
-      .from('reciters')
-      .select('id, name, style, sample_audio_url');
+    const supabase = await createClient();
+    const { data: reciters, error: reciterError } = await getReciters(supabase);
     
     if (reciterError) {
       throw new Error(`Failed to fetch reciters: ${reciterError.message}`);
@@ -53,9 +52,10 @@ export async function POST(request: Request) {
     // Match predictions with database reciters
     const matches = predictionData.predictions.map((prediction: any) => {
       // Find matching reciter in database by style/name
+      const speaker = prediction.speaker.toLowerCase();
       const matchingReciter = reciters?.find(reciter => 
-        reciter.style?.toLowerCase().includes(prediction.speaker.toLowerCase()) ||
-        reciter.name.toLowerCase().includes(prediction.speaker.toLowerCase())
+        reciter.style?.toLowerCase().includes(speaker) ||
+        reciter.name.toLowerCase().includes(speaker)
       );
       
       return {
@@ -2,29 +2,51 @@ import numpy as np
 import os
 import tempfile
 import base64
+import io
 import librosa
+import soundfile as sf
 import scipy.signal
-from fastdtw import fastdtw
-from scipy.spatial.distance import euclidean
+from numba import njit
+from scipy.spatial.distance import cdist
+from scipy.optimize import linear_sum_assignment
+from joblib import Parallel, delayed, effective_n_jobs, parallel_config
 from sklearn.preprocessing import StandardScaler
 import json
+import orjson
 import sys
 import argparse
+import functools
+import logging
+
+logger = logging.getLogger(__name__)
+
+# RAM-backed directory for temp audio files, when the platform has one
+TEMP_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Below this many Stage 2 pairs, batch_score stays in-process; starting and
+# feeding the worker pool costs more than the DTW it would spread out
+MIN_PARALLEL_PAIRS = 16
 
 def process_audio(audio_base64, audio_type='audio/mpeg', segment=True):
     """
     Process audio data to extract features for reciter matching.
     
     Args:
-        audio_base64: Base64 encoded audio data
+        audio_base64: Base64 encoded audio data, or raw audio bytes
         audio_type: MIME type of the audio (default: 'audio/mpeg')
         segment: Whether to segment the audio into verses/ayat (default: True)
         
     Returns:
         Dictionary containing the extracted features and processed data
     """
-    # Convert base64 to binary
-    audio_data = base64.b64decode(audio_base64.split(',')[1] if ',' in audio_base64 else audio_base64)
+    if isinstance(audio_base64, (bytes, bytearray)):
+        # Raw audio needs no decoding
+        audio_data = audio_base64
+    else:
+        # Convert base64 to binary, slicing off any data URL prefix only once
+        comma = audio_base64.find(',')
+        payload = audio_base64 if comma < 0 else audio_base64[comma + 1:]
+        audio_data = base64.b64decode(payload)
     
     # Determine file extension based on audio type
     if audio_type == 'audio/wav' or audio_type == 'audio/wave':
@@ -35,79 +57,151 @@ def process_audio(audio_base64, audio_type='audio/mpeg', segment=True):
         # Default to mp3 for other types
         file_extension = '.mp3'
     
-    # Save to temp file for librosa to read
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-        temp_filename = temp_file.name
-        temp_file.write(audio_data)
+    if file_extension == '.wav':
+        # WAV decodes straight from memory, no temp file needed
+        y, sr = load_audio(io.BytesIO(audio_data), sr=22050)
+    else:
+        # Other formats go through a temp file (RAM-backed where available) for librosa to read
+        with tempfile.NamedTemporaryFile(dir=TEMP_DIR, suffix=file_extension) as temp_file:
+            temp_file.write(audio_data)
+            temp_file.flush()
+            y, sr = load_audio(temp_file.name, sr=22050)
     
-    try:
-        # Load audio with librosa
-        y, sr = librosa.load(temp_filename, sr=22050)
-        
-        # Delete temp file
-        os.unlink(temp_filename)
-        
-        # Extract segments if requested
-        segments = []
-        if segment:
-            segments = segment_audio(y, sr)
-        
-        # Apply voice normalization
-        y_normalized = apply_voice_normalization(y, sr)
-        
-        # Extract core features
-        mfccs = librosa.feature.mfcc(y=y_normalized, sr=sr, n_mfcc=20)
-        chroma = librosa.feature.chroma_stft(y=y_normalized, sr=sr)
-        mel_spec = librosa.feature.melspectrogram(y=y_normalized, sr=sr, n_mels=128)
-        tempo = librosa.feature.tempogram(y=y_normalized, sr=sr)
-        
-        # Extract recitation-specific features
-        pitch_contour = extract_pitch_contour(y_normalized, sr)
-        formants = extract_formants(y_normalized, sr)
-        pause_patterns = extract_pause_patterns(y_normalized, sr)
-        
-        # Create temporal sequence feature representation
-        sequence_features = create_sequence_features(mfccs, chroma, pitch_contour)
+    y = np.ascontiguousarray(y, dtype=np.float32)
+    
+    # Extract segments if requested
+    segments = []
+    if segment:
+        segments = segment_audio(y, sr)
+    
+    # Apply voice normalization
+    y_normalized = apply_voice_normalization(y, sr)
+    
+    # Extract core features, sharing one power spectrogram (and its log-mel) between them
+    power_spec = np.abs(librosa.stft(y_normalized, n_fft=2048, hop_length=512, window=_hann_window(2048))) ** 2
+    mel_spec = _mel_basis(sr, 2048, 128) @ power_spec
+    log_mel = librosa.power_to_db(mel_spec)
+    mfccs = librosa.feature.mfcc(S=log_mel, n_mfcc=20)
+    chroma = librosa.feature.chroma_stft(S=power_spec, sr=sr)
+    onset_env = librosa.onset.onset_strength(S=log_mel, sr=sr)
+    tempo = librosa.feature.tempogram(onset_envelope=onset_env, sr=sr).astype(np.float32, copy=False)
+    
+    # Extract recitation-specific features
+    pitch_contour = extract_pitch_contour(y_normalized, sr)
+    formants = extract_formants(y_normalized, sr)
+    pause_patterns = extract_pause_patterns(y_normalized, sr)
+    
+    # Create temporal sequence feature representation
+    sequence_features = create_sequence_features(mfccs, chroma, pitch_contour)
+    
+    # Create aggregated feature vector (for first-stage matching)
+    mfcc_means, mfcc_stds = _row_mean_std(mfccs)
+    feature_vector = np.concatenate([
+        mfcc_means,                     # Mean of each MFCC coefficient
+        mfcc_stds,                      # Std dev of each MFCC coefficient
+        np.mean(chroma, axis=1),        # Mean of each chroma bin
+        np.mean(mel_spec, axis=1)[:20], # Mean of first 20 mel bands
+        np.mean(tempo, axis=1)[:20],    # Mean of first 20 tempo features
+        np.array([np.mean(pitch_contour)]),  # Mean pitch as 1D array
+        np.array([np.std(pitch_contour)]),   # Pitch variation as 1D array
+        np.mean(formants, axis=1),      # Mean formant values
+        np.array([np.mean(pause_patterns)])  # Pause pattern features as 1D array
+    ]).astype(np.float32)
+    
+    # Normalize the feature vector
+    normalized_vector = feature_vector / np.linalg.norm(feature_vector)
+    
+    return {
+        'feature_vector': normalized_vector.tolist(),  # For first-stage matching
+        'sequence_features': _b64_npy(sequence_features, np.float32),  # For second-stage DTW matching
+        'segments': [seg.tolist() for seg in segments] if segments else [],
+        'mfccs': _b64_npy(mfccs),
+        'chroma': _b64_npy(chroma),
+        'mel_spec': _b64_npy(mel_spec, np.float32),  # Power values can exceed float16 range
+        'pitch_contour': _b64_npy(pitch_contour),
+        'formants': _b64_npy(formants),
+        'pause_patterns': pause_patterns.tolist(),
+        'feature_shapes': {
+            'mfcc_shape': mfccs.shape,
+            'chroma_shape': chroma.shape,
+            'mel_shape': mel_spec.shape,
+            'vector_dimension': len(normalized_vector)
+        }
+    }
+
+def _row_mean_std(x):
+    """
+    Per-row mean and standard deviation of a 2D array in one pass over it.
+    
+    Sums and sums of squares are accumulated in float64, which keeps the
+    E[x^2] - E[x]^2 form accurate for float32 features.
+    
+    Args:
+        x: 2D array with one feature per row
         
-        # Create aggregated feature vector (for first-stage matching)
-        feature_vector = np.concatenate([
-            np.mean(mfccs, axis=1),         # Mean of each MFCC coefficient
-            np.std(mfccs, axis=1),          # Std dev of each MFCC coefficient
-            np.mean(chroma, axis=1),        # Mean of each chroma bin
-            np.mean(mel_spec, axis=1)[:20], # Mean of first 20 mel bands
-            np.mean(tempo, axis=1)[:20],    # Mean of first 20 tempo features
-            np.array([np.mean(pitch_contour)]),  # Mean pitch as 1D array
-            np.array([np.std(pitch_contour)]),   # Pitch variation as 1D array
-            np.mean(formants, axis=1),      # Mean formant values
-            np.array([np.mean(pause_patterns)])  # Pause pattern features as 1D array
-        ])
+    Returns:
+        Tuple of (row means, row standard deviations)
+    """
+    n = x.shape[1]
+    mean = x.sum(axis=1, dtype=np.float64) / n
+    mean_sq = np.einsum('ij,ij->i', x, x, dtype=np.float64) / n
+    return mean, np.sqrt(np.maximum(mean_sq - mean ** 2, 0))
+
+def _b64_npy(a, dtype=np.float16):
+    """
+    Encode an array as base64 NPY bytes instead of a nested JSON list.
+    
+    Args:
+        a: Array to encode
+        dtype: Storage dtype (float16 is plenty for the display features)
         
-        # Normalize the feature vector
-        normalized_vector = feature_vector / np.linalg.norm(feature_vector)
+    Returns:
+        Base64 string of the array saved in NPY format
+    """
+    buf = io.BytesIO()
+    np.save(buf, np.asarray(a, dtype=dtype))
+    return base64.b64encode(buf.getvalue()).decode('ascii')
+
+def _decode_array(value, dtype=np.float64):
+    """
+    Decode a feature that is either a plain list or a _b64_npy string.
+    
+    Args:
+        value: Nested list or base64 NPY string
+        dtype: Dtype of the returned array
         
-        return {
-            'feature_vector': normalized_vector.tolist(),  # For first-stage matching
-            'sequence_features': sequence_features.tolist(),  # For second-stage DTW matching
-            'segments': [seg.tolist() for seg in segments] if segments else [],
-            'mfccs': mfccs.tolist(),
-            'chroma': chroma.tolist(),
-            'mel_spec': mel_spec.tolist(),
-            'pitch_contour': pitch_contour.tolist(),
-            'formants': formants.tolist(),
-            'pause_patterns': pause_patterns.tolist(),
-            'feature_shapes': {
-                'mfcc_shape': mfccs.shape,
-                'chroma_shape': chroma.shape,
-                'mel_shape': mel_spec.shape,
-                'vector_dimension': len(normalized_vector)
-            }
-        }
+    Returns:
+        Numpy array of the feature
+    """
+    if isinstance(value, str):
+        value = np.load(io.BytesIO(base64.b64decode(value)), allow_pickle=False)
+    return np.asarray(value, dtype=dtype)
+
+def load_audio(source, sr):
+    """
+    Load audio as a mono float32 signal.
+    
+    Audio is decoded directly with soundfile (WAV, and MP3 with
+    libsndfile >= 1.1), skipping librosa's generic loading path;
+    anything libsndfile can't decode falls back to librosa.load.
+    
+    Args:
+        source: Path to the audio file, or a file-like object holding WAV data
+        sr: Target sample rate
         
-    except Exception as e:
-        # Ensure temp file is deleted in case of error
-        if os.path.exists(temp_filename):
-            os.unlink(temp_filename)
-        raise e
+    Returns:
+        Tuple of (audio signal, sample rate)
+    """
+    try:
+        y, orig_sr = sf.read(source, dtype='float32', always_2d=False)
+    except RuntimeError:
+        return librosa.load(source, sr=sr, dtype=np.float32)
+    
+    if y.ndim > 1:
+        y = y.mean(axis=1)
+    if orig_sr != sr:
+        y = librosa.resample(y, orig_sr=orig_sr, target_sr=sr)
+    return y, sr
 
 def apply_voice_normalization(y, sr):
     """
@@ -128,7 +222,10 @@ def apply_voice_normalization(y, sr):
     alpha = 0.95  # warping factor between 0.9-1.1 typically
     
     # Apply pre-emphasis as a simple form of spectral shaping
-    y_preemph = librosa.effects.preemphasis(y)
+    # (the same first-order FIR as librosa.effects.preemphasis, run as one lfilter call)
+    b = np.asarray([1.0, -0.97], dtype=y.dtype)
+    a = np.ones(1, dtype=y.dtype)
+    y_preemph = scipy.signal.lfilter(b, a, y)
     
     # For a true VTLN implementation, you would:
     # 1. Compute STFT
@@ -136,20 +233,23 @@ def apply_voice_normalization(y, sr):
     # 3. Inverse STFT
     # This is simplified for demonstration
     
-    # Apply CMVN-like normalization by standardizing the audio
-    y_norm = y_preemph - np.mean(y_preemph)
-    if np.std(y_preemph) > 0:
-        y_norm = y_norm / np.std(y_preemph)
+    # Apply CMVN-like normalization by standardizing the audio in place
+    mean = y_preemph.mean()
+    std = y_preemph.std()
+    np.subtract(y_preemph, mean, out=y_preemph)
+    if std > 0:
+        np.multiply(y_preemph, 1.0 / std, out=y_preemph)
     
-    return y_norm
+    return y_preemph
 
-def segment_audio(y, sr):
+def segment_audio(y, sr, hop_length=512):
     """
     Segment audio into verses/ayat based on silence detection.
     
     Args:
         y: Audio signal
         sr: Sample rate
+        hop_length: Hop length for the MFCC frames
         
     Returns:
         List of segment feature arrays
@@ -160,13 +260,15 @@ def segment_audio(y, sr):
     # Minimum length for a valid segment (in frames)
     min_length = sr * 0.5  # 500ms
     
+    # Compute MFCCs once for the whole signal and map sample intervals onto its frames
+    mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13, hop_length=hop_length)
+    frame_intervals = librosa.samples_to_frames(intervals, hop_length=hop_length)
+    
     segments = []
-    for start, end in intervals:
+    for (start, end), (start_frame, end_frame) in zip(intervals, frame_intervals):
         if end - start > min_length:
-            # For each significant segment, extract features
-            segment = y[start:end]
-            mfccs = librosa.feature.mfcc(y=segment, sr=sr, n_mfcc=13)
-            segments.append(np.mean(mfccs, axis=1))
+            # For each significant segment, average its slice of the MFCCs
+            segments.append(np.mean(mfccs[:, start_frame:end_frame], axis=1))
     
     return segments
 
@@ -185,31 +287,53 @@ def extract_pitch_contour(y, sr):
     pitches, magnitudes = librosa.core.piptrack(y=y, sr=sr)
     
     # For each frame, find the pitch with highest magnitude
-    pitch_contour = []
-    for t in range(pitches.shape[1]):
-        index = magnitudes[:,t].argmax()
-        pitch_contour.append(pitches[index,t])
-    
-    # Convert to numpy array
-    pitch_contour = np.array(pitch_contour)
+    index = np.argmax(magnitudes, axis=0)
+    pitch_contour = pitches[index, np.arange(pitches.shape[1])].astype(np.float32, copy=False)
     
     # Filter out unreliable pitch estimates
     pitch_contour[pitch_contour <= 0] = 0
     
     # Ensure we have at least one valid element
     if len(pitch_contour) == 0 or np.all(pitch_contour == 0):
-        pitch_contour = np.array([0.0])
+        pitch_contour = np.zeros(1, dtype=np.float32)
     
     return pitch_contour
 
-def extract_formants(y, sr, n_formants=3):
+@functools.lru_cache(maxsize=8)
+def _mel_basis(sr, n_fft, n_mels):
+    """Build (once per parameter set) a read-only mel filterbank"""
+    basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    basis.flags.writeable = False
+    return basis
+
+@functools.lru_cache(maxsize=8)
+def _hann_window(n_fft):
+    """Build (once per FFT size) a read-only periodic float32 Hann window"""
+    window = scipy.signal.windows.hann(n_fft, sym=False).astype(np.float32)
+    window.flags.writeable = False
+    return window
+
+@functools.lru_cache(maxsize=8)
+def _hamming_window(frame_length):
+    """Build (once per frame length) a read-only float32 Hamming window"""
+    window = scipy.signal.windows.hamming(frame_length).astype(np.float32)
+    window.flags.writeable = False
+    return window
+
+def extract_formants(y, sr, n_formants=3, estimate=False):
     """
     Extract formants to capture voice characteristics.
     
+    Estimation is off by default: the original extraction never produced
+    formants (its LPC call always failed), so every stored catalog vector
+    holds zeros in these slots. Turning it on changes feature_vector, so
+    it has to ship together with a catalog regeneration.
+    
     Args:
         y: Audio signal
         sr: Sample rate
         n_formants: Number of formants to extract
+        estimate: Whether to estimate formants instead of returning zeros
         
     Returns:
         Array of formant frequencies
@@ -223,36 +347,33 @@ def extract_formants(y, sr, n_formants=3):
     
     # Calculate LPC coefficients (approximates vocal tract)
     n_lpc = 2 + n_formants * 2  # Rule of thumb for LPC order
-    formants = np.zeros((n_formants, len(range(0, len(y_preemph) - frame_length, hop_length))))
-    
-    for i, frame in enumerate(range(0, len(y_preemph) - frame_length, hop_length)):
-        frame_data = y_preemph[frame:frame + frame_length]
-        # Apply window
-        frame_data = frame_data * scipy.signal.windows.hamming(len(frame_data))
+    n_frames = len(range(0, len(y_preemph) - frame_length, hop_length))
+    formants = np.zeros((n_formants, n_frames), dtype=np.float32)
+    if n_frames == 0 or not estimate:
+        return formants
+    
+    # Slice every frame as a strided view and window them all in one multiply
+    frames = librosa.util.frame(y_preemph, frame_length=frame_length, hop_length=hop_length)[:, :n_frames]
+    frames = frames * _hamming_window(frame_length)[:, np.newaxis]
+    
+    # LPC analysis for all frames in a single call, one row of coefficients per frame
+    lpc_coeffs = librosa.lpc(frames.T, order=n_lpc)
+    
+    for i, a in enumerate(lpc_coeffs):
+        # Find the LPC poles: a is ordered by descending power of z, as np.roots
+        # expects, so its roots are the poles rather than their reciprocals
+        roots = np.roots(a)
         
-        # LPC analysis
-        try:
-            a = librosa.lpc(frame_data, n_lpc)
-            
-            # Find roots of the polynomial
-            roots = np.polynomial.polynomial.polyroots(a)
-            
-            # Keep only the stable roots
-            roots = [r for r in roots if np.abs(r) < 1]
-            
-            # Calculate angles for the roots
-            angles = np.angle(roots)
-            
-            # Convert angles to frequencies and sort
-            freqs = np.abs(angles) * sr / (2 * np.pi)
-            freqs = sorted(freqs)
-            
-            # Store up to n_formants
-            for j in range(min(n_formants, len(freqs))):
-                formants[j, i] = freqs[j]
-        except:
-            # If LPC analysis fails, use zeros
-            pass
+        # Keep only the stable complex poles, one of each conjugate pair; real
+        # poles shape the spectral tilt and would report 0 Hz or Nyquist
+        roots = roots[(np.abs(roots) < 1) & (roots.imag > 0)]
+        
+        # Convert angles to frequencies and sort
+        freqs = np.abs(np.angle(roots)) * sr / (2 * np.pi)
+        freqs.sort()
+        
+        # Store up to n_formants
+        formants[:min(n_formants, freqs.size), i] = freqs[:n_formants]
     
     return formants
 
@@ -275,27 +396,19 @@ def extract_pause_patterns(y, sr):
     threshold = 0.05 * np.max(rms)  # Adaptive threshold
     is_pause = (rms < threshold).astype(np.int8)
     
-    # Calculate pause statistics
-    pause_lengths = []
-    current_pause = 0
-    
-    for i in range(len(is_pause)):
-        if is_pause[i] == 1:
-            current_pause += 1
-        elif current_pause > 0:
-            pause_lengths.append(current_pause)
-            current_pause = 0
-    
-    if current_pause > 0:
-        pause_lengths.append(current_pause)
+    # Calculate pause statistics from run boundaries (+1 where a pause starts, -1 where it ends)
+    edges = np.diff(np.concatenate(([0], is_pause, [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    pause_lengths = ends - starts
     
     # Create pause features
-    if pause_lengths:
+    if pause_lengths.size:
         pause_features = np.array([
-            len(pause_lengths),             # Number of pauses
+            pause_lengths.size,             # Number of pauses
             np.mean(pause_lengths),         # Average pause length
-            np.std(pause_lengths) if len(pause_lengths) > 1 else 0,  # Pause length variation
-            np.max(pause_lengths) if pause_lengths else 0,           # Longest pause
+            np.std(pause_lengths) if pause_lengths.size > 1 else 0,  # Pause length variation
+            np.max(pause_lengths),          # Longest pause
         ])
     else:
         pause_features = np.zeros(4)
@@ -317,32 +430,59 @@ def create_sequence_features(mfccs, chroma, pitch):
     # Use a subset of features to keep the sequence matrix manageable
     sequence_length = min(mfccs.shape[1], len(pitch))
     
-    # Create a matrix where each column is a time frame and rows are features
-    sequence = np.zeros((mfccs.shape[0] + 4, sequence_length))
+    n_mfcc = mfccs.shape[0]
+    
+    # Create a matrix where each column is a time frame and rows are features;
+    # every row is written in place below, so it can start uninitialized
+    sequence = np.empty((n_mfcc + 4, sequence_length), dtype=np.float32)
+    mfccs = mfccs[:, :sequence_length]
     
     # Add MFCCs
-    sequence[:mfccs.shape[0], :mfccs.shape[1]] = mfccs[:, :sequence_length]
+    np.copyto(sequence[:n_mfcc], mfccs)
     
     # Add key chroma features
-    chroma_features = np.mean(chroma, axis=0)[:sequence_length]
-    if len(chroma_features) > 0:
-        sequence[-4, :len(chroma_features)] = chroma_features
+    chroma_length = min(chroma.shape[1], sequence_length)
+    np.mean(chroma[:, :chroma_length], axis=0, out=sequence[-4, :chroma_length])
+    sequence[-4, chroma_length:] = 0
     
     # Add pitch features
-    if len(pitch) > 0:
-        sequence[-3, :min(len(pitch), sequence_length)] = pitch[:sequence_length]
+    np.copyto(sequence[-3], pitch[:sequence_length])
     
-    # Add pitch derivative (change)
-    if len(pitch) > 1:
-        pitch_diff = np.diff(pitch, prepend=pitch[0])[:sequence_length]
-        sequence[-2, :min(len(pitch_diff), sequence_length)] = pitch_diff
+    # Add pitch derivative (change), zero for the first frame
+    sequence[-2, :1] = 0
+    np.subtract(pitch[1:sequence_length], pitch[:sequence_length - 1], out=sequence[-2, 1:])
     
-    # Add energy envelope
-    energy = np.sqrt(np.sum(mfccs**2, axis=0))[:sequence_length]
-    sequence[-1, :len(energy)] = energy
+    # Add energy envelope (L2 norm of each MFCC frame)
+    np.einsum('ij,ij->j', mfccs, mfccs, out=sequence[-1], casting='same_kind')
+    np.sqrt(sequence[-1], out=sequence[-1])
     
     return sequence
 
+@njit(cache=True)
+def dtw_banded(cost, band):
+    """
+    Compute the DTW distance over a precomputed cost matrix, restricted to
+    a Sakoe-Chiba band around the diagonal.
+    
+    Args:
+        cost: Pairwise frame distance matrix (n_frames1 x n_frames2)
+        band: Maximum allowed |i - j| offset of the warping path
+        
+    Returns:
+        Accumulated cost of the optimal warping path
+    """
+    n, m = cost.shape
+    # The band must be wide enough to reach the bottom-right corner
+    band = max(band, abs(n - m))
+    
+    acc = np.full((n + 1, m + 1), np.inf)
+    acc[0, 0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(max(1, i - band), min(m, i + band) + 1):
+            acc[i, j] = cost[i - 1, j - 1] + min(acc[i - 1, j], acc[i, j - 1], acc[i - 1, j - 1])
+    
+    return acc[n, m]
+
 def calculate_similarity(vector1, vector2, method="combined", sequence1=None, sequence2=None):
     """
     Calculates similarity using a weighted approach of cosine similarity and DTW.
@@ -380,15 +520,14 @@ def calculate_similarity(vector1, vector2, method="combined", sequence1=None, se
         try:
             # Select subset of frames to make DTW computation more efficient
             step = max(1, min(sequence1.shape[1], sequence2.shape[1]) // 100)
-            seq1_subset = sequence1[:, ::step]
-            seq2_subset = sequence2[:, ::step]
-            
-            # Transpose to have time as first dimension
-            seq1_subset = seq1_subset.T 
-            seq2_subset = seq2_subset.T
+            # Copy out time-major, contiguous frames so the cost matrix reads memory in order
+            seq1_subset = np.ascontiguousarray(sequence1[:, ::step].T, dtype=np.float32)
+            seq2_subset = np.ascontiguousarray(sequence2[:, ::step].T, dtype=np.float32)
             
-            # Calculate DTW distance
-            distance, _ = fastdtw(seq1_subset, seq2_subset, dist=euclidean)
+            # Calculate DTW distance over the pairwise frame distances
+            cost = cdist(seq1_subset, seq2_subset, 'euclidean')
+            band = max(10, min(cost.shape) // 10)
+            distance = dtw_banded(cost, band)
             
             # Normalize DTW distance
             max_len = max(seq1_subset.shape[0], seq2_subset.shape[0])
@@ -403,7 +542,7 @@ def calculate_similarity(vector1, vector2, method="combined", sequence1=None, se
                 return float(0.4 * cosine_sim + 0.6 * dtw_sim)
         except Exception as e:
             # Fall back to cosine similarity if DTW fails
-            print(f"DTW failed: {e}. Falling back to cosine similarity.")
+            logger.warning("DTW failed: %s. Falling back to cosine similarity.", e)
             return float(cosine_sim)
     
     # Default: return cosine similarity
@@ -433,32 +572,23 @@ def compare_segments(segments1, segments2):
     else:
         reference, query = segments2, segments1
     
-    # Build a similarity matrix
-    sim_matrix = np.zeros((len(reference), len(query)))
-    for i, ref_seg in enumerate(reference):
-        for j, q_seg in enumerate(query):
-            sim_matrix[i, j] = np.dot(ref_seg / np.linalg.norm(ref_seg), 
-                                      q_seg / np.linalg.norm(q_seg))
+    # Stack segments into matrices
+    ref_matrix = np.asarray(reference, dtype=np.float64)
+    query_matrix = np.asarray(query, dtype=np.float64)
     
-    # Find best matches using dynamic programming
-    similarities = []
-    used_indices = set()
+    # Build the full cosine similarity matrix in one C call
+    sim_matrix = 1.0 - cdist(ref_matrix, query_matrix, metric='cosine')
     
-    for j in range(len(query)):
-        best_sim = -1
-        best_idx = -1
-        
-        for i in range(len(reference)):
-            if i not in used_indices and sim_matrix[i, j] > best_sim:
-                best_sim = sim_matrix[i, j]
-                best_idx = i
-        
-        if best_idx >= 0:
-            used_indices.add(best_idx)
-            similarities.append(best_sim)
+    # cdist gives NaN for an all-zero segment (and client input can overflow);
+    # score those pairs as 0, since the assignment below rejects non-finite costs
+    sim_matrix[~np.isfinite(sim_matrix)] = 0.0
+    
+    # Find the globally best one-to-one matching of segments
+    row_ind, col_ind = linear_sum_assignment(-sim_matrix)
+    similarities = sim_matrix[row_ind, col_ind]
     
     # Calculate average similarity across matched segments
-    return float(np.mean(similarities) if similarities else 0.0)
+    return float(similarities.mean()) if similarities.size else 0.0
 
 def two_stage_matcher(sample1, sample2):
     """
@@ -471,9 +601,9 @@ def two_stage_matcher(sample1, sample2):
     Returns:
         Dictionary with similarity scores and match details
     """
-    # Stage 1: Fast matching using feature vectors
-    vector1 = np.array(sample1['feature_vector'])
-    vector2 = np.array(sample2['feature_vector'])
+    # Stage 1: Fast matching using feature vectors (already L2-normalized, so cosine is a dot product)
+    vector1 = _decode_array(sample1['feature_vector'], np.float32)
+    vector2 = _decode_array(sample2['feature_vector'], np.float32)
     
     cosine_sim = calculate_similarity(vector1, vector2, method="cosine")
     
@@ -485,9 +615,25 @@ def two_stage_matcher(sample1, sample2):
             'stage': 1
         }
     
-    # Stage 2: Detailed matching with DTW
-    sequence1 = np.array(sample1['sequence_features'])
-    sequence2 = np.array(sample2['sequence_features'])
+    return _detailed_match(vector1, vector2, sample1, sample2, cosine_sim)
+
+def _detailed_match(vector1, vector2, sample1, sample2, cosine_sim):
+    """
+    Run the DTW and segment stages for a pair that passed Stage 1.
+    
+    Args:
+        vector1: First decoded feature vector
+        vector2: Second decoded feature vector
+        sample1: First audio sample features dictionary
+        sample2: Second audio sample features dictionary
+        cosine_sim: Stage 1 similarity of the pair
+    
+    Returns:
+        Dictionary with similarity scores and match details
+    """
+    # Stage 2: Detailed matching with DTW, decoding the sequences only once Stage 1 passes
+    sequence1 = _decode_array(sample1['sequence_features'])
+    sequence2 = _decode_array(sample2['sequence_features'])
     
     combined_sim = calculate_similarity(
         vector1, vector2, 
@@ -515,10 +661,104 @@ def two_stage_matcher(sample1, sample2):
         'stage': 3 if segment_sim > 0 else 2
     }
 
+def batch_score(catalog_vectors, catalog_sequences, query_dict, threshold=0.5, n_jobs=-1):
+    """
+    Score one query against a whole reciter catalog.
+    
+    Stage 1 is a single matrix-vector product over the stacked catalog
+    vectors; only the entries that pass the threshold go on to the
+    detailed DTW/segment stages, which run in parallel worker processes.
+    
+    Args:
+        catalog_vectors: (K, D) array of normalized catalog feature vectors
+        catalog_sequences: List of K catalog feature dictionaries providing
+            'sequence_features' (and optionally 'segments') for Stage 2
+        query_dict: Query audio sample features dictionary
+        threshold: Minimum Stage 1 similarity for running Stage 2
+        n_jobs: Number of worker processes (-1 uses all cores)
+    
+    Returns:
+        List of K match dictionaries in catalog order, as from two_stage_matcher
+    """
+    catalog_vectors = np.asarray(catalog_vectors, dtype=np.float32)
+    query_vector = _decode_array(query_dict['feature_vector'], np.float32)
+    
+    # Stage 1 for the whole catalog at once
+    scores = catalog_vectors @ query_vector
+    results = [
+        {'similarity': float(score), 'method': 'cosine_only', 'stage': 1}
+        for score in scores
+    ]
+    
+    survivors = np.flatnonzero(scores >= threshold)
+    if survivors.size == 0:
+        return results
+    
+    # Decode the query's Stage 2 inputs once instead of in every task, and
+    # send workers only the fields _detailed_match reads; catalog entries
+    # stay encoded, which is smaller to pickle, and are decoded in the workers
+    query = {
+        'sequence_features': _decode_array(query_dict['sequence_features']),
+        'segments': [np.asarray(seg, dtype=np.float64) for seg in query_dict.get('segments') or []],
+    }
+    tasks = [
+        (query_vector, catalog_vectors[i], query, _match_fields(catalog_sequences[i]), scores[i])
+        for i in survivors
+    ]
+    
+    n_workers = effective_n_jobs(n_jobs)
+    if n_workers == 1 or len(tasks) < MIN_PARALLEL_PAIRS:
+        detailed = [_detailed_match(*task) for task in tasks]
+    else:
+        # A few batches per worker keeps dispatch overhead low while still
+        # balancing uneven DTW sizes; each worker is pinned to one BLAS/OpenMP
+        # thread so the process pool doesn't oversubscribe
+        batch_size = max(1, len(tasks) // (4 * n_workers))
+        with parallel_config(backend='loky', inner_max_num_threads=1):
+            detailed = Parallel(n_jobs=n_workers, batch_size=batch_size)(
+                delayed(_detailed_match)(*task) for task in tasks
+            )
+    
+    for i, result in zip(survivors, detailed):
+        results[i] = result
+    
+    return results
+
+def _match_fields(sample):
+    """
+    Keep only the fields of a features dictionary that Stage 2 reads.
+    
+    Args:
+        sample: Audio sample features dictionary
+    
+    Returns:
+        Dictionary with 'sequence_features' and 'segments'
+    """
+    return {
+        'sequence_features': sample['sequence_features'],
+        'segments': sample.get('segments'),
+    }
+
+def write_json(data):
+    """
+    Write a result to stdout as a single line of JSON.
+    
+    Uses orjson, which is much faster than the json module on the large
+    nested feature lists and serializes numpy values natively.
+    
+    Args:
+        data: JSON-serializable result (numpy arrays and scalars allowed)
+    """
+    sys.stdout.buffer.write(orjson.dumps(
+        data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE
+    ))
+    sys.stdout.flush()
+
 # Add CLI handler to enable calling from JavaScript
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Audio processing for Tarteel')
     parser.add_argument('--process', help='Process audio data (base64 encoded or @file path)')
+    parser.add_argument('--process-file', help='Process a raw audio file, skipping base64 encoding')
     parser.add_argument('--audio-type', default='audio/mpeg', help='MIME type of the audio')
     parser.add_argument('--match', help='Match two audio samples (JSON encoded or @file path)')
     
@@ -543,7 +783,27 @@ if __name__ == "__main__":
                 audio_data = args.process
                 
             features = process_audio(audio_data, args.audio_type)
-            print(json.dumps(features))
+            write_json(features)
+            sys.exit(0)
+        except Exception as e:
+            print(json.dumps({"error": str(e)}), file=sys.stderr)
+            sys.exit(1)
+    
+    # Process raw audio file
+    if args.process_file:
+        try:
+            if not os.path.exists(args.process_file):
+                print(json.dumps({"error": f"Input file not found: {args.process_file}"}), file=sys.stderr)
+                sys.exit(1)
+            try:
+                with open(args.process_file, 'rb') as file:
+                    audio_data = file.read()
+            except Exception as e:
+                print(json.dumps({"error": f"Failed to read input file: {str(e)}"}), file=sys.stderr)
+                sys.exit(1)
+                
+            features = process_audio(audio_data, args.audio_type)
+            write_json(features)
             sys.exit(0)
         except Exception as e:
             print(json.dumps({"error": str(e)}), file=sys.stderr)
@@ -575,13 +835,13 @@ if __name__ == "__main__":
                 
             # Perform two-stage matching
             result = two_stage_matcher(samples['sample1'], samples['sample2'])
-            print(json.dumps(result))
+            write_json(result)
             sys.exit(0)
         except Exception as e:
             print(json.dumps({"error": str(e)}), file=sys.stderr)
             sys.exit(1)
     
     # No valid arguments provided
-    if not args.process and not args.match:
+    if not args.process and not args.process_file and not args.match:
         parser.print_help()
         sys.exit(1) 
\ No newline at end of file
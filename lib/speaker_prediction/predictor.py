@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import librosa
+import soundfile as sf
 import numpy as np
 import pickle
 import sys
 import json
 import base64
 import tempfile
+import io
+import functools
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 class SimpleSpeakerNet(nn.Module):
     def __init__(self, n_speakers=33, n_mels=40):
@@ -32,11 +39,23 @@ class SimpleSpeakerNet(nn.Module):
         x = self.classifier(x)
         return x
 
+# RAM-backed directory for temp audio files, when the platform has one
+TEMP_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
 def extract_features(audio_path, max_length=200):
-    """Extract mel spectrogram features"""
+    """Extract mel spectrogram features from a path or a file-like object of audio data"""
     try:
-        # Load audio
-        audio, sr = librosa.load(audio_path, sr=16000, mono=True)
+        # Load audio, decoding directly with soundfile and falling back to
+        # librosa for formats libsndfile can't read
+        try:
+            audio, sr = sf.read(audio_path, dtype='float32', always_2d=False)
+            if audio.ndim > 1:
+                audio = audio.mean(axis=1)
+            if sr != 16000:
+                audio = librosa.resample(audio, orig_sr=sr, target_sr=16000)
+                sr = 16000
+        except RuntimeError:
+            audio, sr = librosa.load(audio_path, sr=16000, mono=True)
         
         # Extract mel spectrogram
         mel_spec = librosa.feature.melspectrogram(
@@ -49,25 +68,26 @@ def extract_features(audio_path, max_length=200):
         
         # Trim or pad to fixed length
         if mel_spec.shape[1] > max_length:
-            # Take multiple segments for more robust prediction
-            segments = []
+            # Take multiple segments for more robust prediction,
+            # copied straight into one preallocated batch array
             step = max(1, (mel_spec.shape[1] - max_length) // 4)  # 5 segments
-            for start in range(0, mel_spec.shape[1] - max_length + 1, step):
-                segment = mel_spec[:, start:start + max_length]
-                segments.append(segment)
-            return np.array(segments)
+            starts = range(0, mel_spec.shape[1] - max_length + 1, step)
+            segments = np.empty((len(starts), mel_spec.shape[0], max_length), dtype=mel_spec.dtype)
+            for i, start in enumerate(starts):
+                segments[i] = mel_spec[:, start:start + max_length]
+            return segments
         else:
             # Pad with zeros
             pad_width = max_length - mel_spec.shape[1]
             mel_spec = np.pad(mel_spec, ((0, 0), (0, pad_width)), mode='constant')
-            return np.array([mel_spec])  # Single segment
+            return mel_spec[np.newaxis]  # Single segment
             
     except Exception as e:
-        print(f"Error processing {audio_path}: {e}")
+        logger.warning("Error processing %s: %s", audio_path, e)
         return None
 
 class QuranSpeakerPredictor:
-    def __init__(self):
+    def __init__(self, compile_model=False):
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         
         # Use local files in the same directory
@@ -88,8 +108,43 @@ class QuranSpeakerPredictor:
         self.model.to(self.device)
         self.model.eval()
         
+        # On GPU, run in half precision and let cuDNN pick the fastest conv kernels
+        self.use_half = self.device.type == 'cuda'
+        if self.use_half:
+            self.model = self.model.half()
+            torch.backends.cudnn.benchmark = True
+        
+        # Compilation takes seconds, so only do it when the predictor is long-lived
+        if compile_model:
+            self._compile_model()
+        
         # print(f"Loaded original model for {len(self.speaker_mapping)} speakers")
     
+    def _compile_model(self, max_length=200):
+        """Compile the forward pass into a fused graph and warm it up"""
+        dtype = torch.float16 if self.use_half else torch.float32
+        # extract_features sends one segment for short clips and five for longer
+        # ones; warm up both so the first real request does not recompile
+        warmups = [torch.zeros((n, 1, self.model.n_mels, max_length), dtype=dtype, device=self.device)
+                   for n in (1, 5)]
+        
+        try:
+            # Batch size varies per clip, so compile with dynamic shapes; CUDA graphs
+            # ('reduce-overhead') only apply on GPU
+            mode = 'reduce-overhead' if self.device.type == 'cuda' else None
+            compiled = torch.compile(self.model, mode=mode, fullgraph=True, dynamic=True)
+            with torch.inference_mode():
+                for warmup in warmups:
+                    compiled(warmup)
+        except Exception:
+            # Fall back to TorchScript where the inductor toolchain is unavailable
+            compiled = torch.jit.script(self.model)
+            with torch.inference_mode():
+                for warmup in warmups:
+                    compiled(warmup)
+        
+        self.model = compiled
+    
     def predict_from_file(self, audio_path, top_k=5):
         """Predict the speaker for an audio file"""
         features = extract_features(audio_path)
@@ -98,16 +153,16 @@ class QuranSpeakerPredictor:
         
         # Convert to tensor
         features_tensor = torch.FloatTensor(features).unsqueeze(1).to(self.device)  # Add channel dim
+        if self.use_half:
+            features_tensor = features_tensor.half()
         
-        with torch.no_grad():
-            outputs = self.model(features_tensor)
-            
-            # Average predictions across segments
-            if len(outputs) > 1:
-                outputs = torch.mean(outputs, dim=0, keepdim=True)
+        with torch.inference_mode():
+            # Keep the softmax/top-k in float32 for numerical stability
+            outputs = self.model(features_tensor).float()
             
-            # Get probabilities
-            probs = torch.softmax(outputs, dim=1)
+            # Average log-probabilities across segments, then renormalize
+            log_probs = F.log_softmax(outputs, dim=1).mean(dim=0, keepdim=True)
+            probs = F.log_softmax(log_probs, dim=1).exp()
             
             # Get top predictions
             top_probs, top_indices = torch.topk(probs, min(top_k, len(self.speaker_mapping)))
@@ -125,53 +180,83 @@ class QuranSpeakerPredictor:
         try:
             audio_data = base64.b64decode(audio_base64)
             
-            with tempfile.NamedTemporaryFile(suffix=f".{format}", delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_path = temp_file.name
-            
-            results = self.predict_from_file(temp_path, top_k)
-            os.unlink(temp_path)
+            # WAV decodes straight from memory, no temp file needed
+            if format == "wav":
+                return self.predict_from_file(io.BytesIO(audio_data), top_k)
             
-            return results
+            with tempfile.NamedTemporaryFile(suffix=f".{format}", dir=TEMP_DIR) as temp_file:
+                temp_file.write(audio_data)
+                temp_file.flush()
+                return self.predict_from_file(temp_file.name, top_k)
         except Exception as e:
             return None
 
+@functools.lru_cache(maxsize=1)
+def get_predictor(compile_model=False):
+    """Load the predictor once per process and reuse it across requests"""
+    return QuranSpeakerPredictor(compile_model=compile_model)
+
+def handle_request(predictor, input_data):
+    """Run a single prediction request and build its JSON response"""
+    if "audio_path" in input_data:
+        results = predictor.predict_from_file(
+            input_data["audio_path"], 
+            input_data.get("top_k", 5)
+        )
+    elif "audio_base64" in input_data:
+        results = predictor.predict_from_base64(
+            input_data["audio_base64"],
+            input_data.get("format", "mp3"),
+            input_data.get("top_k", 5)
+        )
+    else:
+        return {"error": "Missing audio_path or audio_base64"}
+    
+    if results is None:
+        return {"error": "Failed to process audio"}
+    
+    return {
+        "success": True,
+        "predictions": results,
+        "num_speakers": len(predictor.speaker_mapping)
+    }
+
+def serve():
+    """
+    Answer newline-delimited JSON requests on stdin, one JSON line per reply.
+    
+    The model and speaker mapping are loaded (and compiled) once, so a
+    long-running caller pays the startup cost only on spawn.
+    """
+    predictor = get_predictor(compile_model=True)
+    
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        
+        try:
+            response = handle_request(predictor, json.loads(line))
+        except Exception as e:
+            response = {"error": str(e)}
+        
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
 def main():
     if len(sys.argv) != 2:
-        print(json.dumps({"error": "Usage: python predictor.py <input_json>"}))
+        print(json.dumps({"error": "Usage: python predictor.py <input_json> | --serve"}))
+        return
+    
+    if sys.argv[1] == "--serve":
+        serve()
         return
     
     try:
         input_data = json.loads(sys.argv[1])
-        predictor = QuranSpeakerPredictor()
-        
-        if "audio_path" in input_data:
-            results = predictor.predict_from_file(
-                input_data["audio_path"], 
-                input_data.get("top_k", 5)
-            )
-        elif "audio_base64" in input_data:
-            results = predictor.predict_from_base64(
-                input_data["audio_base64"],
-                input_data.get("format", "mp3"),
-                input_data.get("top_k", 5)
-            )
-        else:
-            print(json.dumps({"error": "Missing audio_path or audio_base64"}))
-            return
-        
-        if results is None:
-            print(json.dumps({"error": "Failed to process audio"}))
-            return
-        
-        print(json.dumps({
-            "success": True,
-            "predictions": results,
-            "num_speakers": len(predictor.speaker_mapping)
-        }))
+        print(json.dumps(handle_request(get_predictor(), input_data)))
         
     except Exception as e:
         print(json.dumps({"error": str(e)}))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
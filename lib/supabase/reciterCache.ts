@@ -0,0 +1,56 @@
+/**
+ * Reciter Cache Module
+ * Keeps the reciters reference table in module state so the matching
+ * routes don't re-query Supabase on every request:
+ * - Time-based expiry
+ * - Explicit invalidation after reciter writes
+ */
+
+import type { PostgrestError, SupabaseClient } from '@supabase/supabase-js';
+import type { Database } from '@/lib/database.types';
+
+// Columns the matching routes need from the reciters table
+type ReciterSummary = Pick<
+  Database['public']['Tables']['reciters']['Row'],
+  'id' | 'name' | 'style' | 'sample_audio_url'
+>;
+
+// How long a fetched reciter list is served before re-querying
+const RECITER_CACHE_TTL_MS = 60 * 1000;
+
+let cachedReciters: ReciterSummary[] | null = null;
+let cachedAt = 0;
+
+/**
+ * Get all reciters, served from the module cache while it is fresh
+ * @param supabase Supabase client to query with on a cache miss
+ * @returns Reciter rows and any query error, mirroring a Supabase response
+ */
+export async function getReciters(
+  supabase: SupabaseClient<Database>
+): Promise<{ data: ReciterSummary[] | null; error: PostgrestError | null }> {
+  if (cachedReciters && Date.now() - cachedAt < RECITER_CACHE_TTL_MS) {
+    return { data: cachedReciters, error: null };
+  }
+
+  const { data, error } = await supabase
+    .from('reciters')
+    .select('id, name, style, sample_audio_url');
+
+  if (error) {
+    return { data: null, error };
+  }
+
+  cachedReciters = data;
+  cachedAt = Date.now();
+
+  return { data, error: null };
+}
+
+/**
+ * Drop the cached reciter list so the next lookup re-queries Supabase
+ */
+export function invalidateReciterCache(): void {
+  cachedReciters = null;
+  cachedAt = 0;
+}
@@ -2,7 +2,7 @@
  * Script to import all reciters from the public/everyayah_fatiha directory
  * This script:
  * 1. Reads all reciter directories
- * 2. Creates database entries for each reciter
+ * 2. Creates or updates database entries for all reciters in batches
  * 3. Generates feature vectors for each
  * 
  * Run with: npx ts-node scripts/import-reciters.ts
@@ -27,6 +27,11 @@ if (!supabaseUrl || !supabaseServiceRoleKey) {
 
 const supabase = createClient<Database>(supabaseUrl, supabaseServiceRoleKey);
 
+type ReciterInsert = Database['public']['Tables']['reciters']['Insert'];
+
+// Maximum number of rows sent to Supabase in a single request
+const BATCH_SIZE = 100;
+
 /**
  * Clean up reciter name from directory name
  */
@@ -53,36 +58,42 @@ function generateFeatureVector() {
   };
 }
 
+/**
+ * Split an array into batches of at most `size` items
+ */
+function chunk<T>(items: T[], size: number): T[][] {
+  const batches: T[][] = [];
+  for (let i = 0; i < items.length; i += size) {
+    batches.push(items.slice(i, i + size));
+  }
+  return batches;
+}
+
 async function main() {
   try {
     // Path to reciter directories
     const fatihaDir = path.join(process.cwd(), 'public', 'everyayah_fatiha');
     
-    // Get all reciter directories
-    const reciterDirs = fs.readdirSync(fatihaDir).filter(dir => 
-      fs.statSync(path.join(fatihaDir, dir)).isDirectory()
-    );
+    // Get all reciter directories, using the entry types from the directory
+    // listing and only stat'ing symlinks to see where they point
+    const reciterDirs = fs.readdirSync(fatihaDir, { withFileTypes: true })
+      .filter(entry => 
+        entry.isDirectory() ||
+        (entry.isSymbolicLink() && fs.statSync(path.join(fatihaDir, entry.name)).isDirectory())
+      )
+      .map(entry => entry.name);
     
     console.log(`Found ${reciterDirs.length} reciter directories`);
     
-    // Process each reciter
+    // Build one row per reciter; directories that format to the same name
+    // collapse into one entry, the last directory winning
+    const reciters = new Map<string, ReciterInsert>();
     for (const dir of reciterDirs) {
       // Format reciter name
       const reciterName = formatReciterName(dir);
       
       console.log(`Processing ${reciterName}`);
       
-      // Check if reciter already exists
-      const { data: existingReciters, error: checkError } = await supabase
-        .from('reciters')
-        .select('id, name')
-        .eq('name', reciterName);
-      
-      if (checkError) {
-        console.error(`Error checking reciter ${reciterName}:`, checkError);
-        continue;
-      }
-      
       // Determine sample audio path
       const sampleAudioPath = `/everyayah_fatiha/${dir}/001001.mp3`;
       const fullSamplePath = path.join(process.cwd(), 'public', sampleAudioPath);
@@ -95,47 +106,86 @@ async function main() {
         console.warn(`Sample audio not found for ${reciterName}`);
       }
       
-      // Generate feature vector
-      const featureVector = generateFeatureVector();
+      reciters.set(reciterName, {
+        name: reciterName,
+        sample_audio_url: audioUrl,
+        // Generate feature vector
+        feature_vector: generateFeatureVector()
+      });
+    }
+    
+    // Look up which reciters already exist, one query per batch of names
+    const existingIds = new Map<string, string>();
+    const uncheckedNames = new Set<string>();
+    
+    for (const names of chunk(Array.from(reciters.keys()), BATCH_SIZE)) {
+      const { data: existingReciters, error: checkError } = await supabase
+        .from('reciters')
+        .select('id, name')
+        .in('name', names);
       
-      if (existingReciters && existingReciters.length > 0) {
-        // Update existing reciter
-        const reciterId = existingReciters[0].id;
-        console.log(`Updating existing reciter: ${reciterName}`);
-        
-        const { error: updateError } = await supabase
-          .from('reciters')
-          .update({
-            sample_audio_url: audioUrl,
-            feature_vector: featureVector
-          })
-          .eq('id', reciterId);
-        
-        if (updateError) {
-          console.error(`Error updating reciter ${reciterName}:`, updateError);
-        } else {
-          console.log(`Updated ${reciterName} successfully`);
+      if (checkError) {
+        console.error(`Error checking reciters ${names.join(', ')}:`, checkError);
+        names.forEach(name => uncheckedNames.add(name));
+        continue;
+      }
+      
+      for (const reciter of existingReciters ?? []) {
+        if (!existingIds.has(reciter.name)) {
+          existingIds.set(reciter.name, reciter.id);
         }
+      }
+    }
+    
+    // Split into updates of existing reciters and inserts of new ones
+    const updates: ReciterInsert[] = [];
+    const inserts: ReciterInsert[] = [];
+    
+    for (const reciter of reciters.values()) {
+      if (uncheckedNames.has(reciter.name)) {
+        continue;
+      }
+      
+      const reciterId = existingIds.get(reciter.name);
+      if (reciterId) {
+        updates.push({ id: reciterId, ...reciter });
       } else {
-        // Create new reciter
-        console.log(`Creating new reciter: ${reciterName}`);
-        
-        const { error: insertError } = await supabase
-          .from('reciters')
-          .insert({
-            name: reciterName,
-            bio: `Classical Quran reciter.`,
-            era: 'Classical',
-            style: 'Traditional',
-            sample_audio_url: audioUrl,
-            feature_vector: featureVector
-          });
-        
-        if (insertError) {
-          console.error(`Error creating reciter ${reciterName}:`, insertError);
-        } else {
-          console.log(`Created ${reciterName} successfully`);
-        }
+        inserts.push({
+          ...reciter,
+          bio: `Classical Quran reciter.`,
+          era: 'Classical',
+          style: 'Traditional'
+        });
+      }
+    }
+    
+    // Update existing reciters, upserting on the primary key so each batch is one request
+    for (const batch of chunk(updates, BATCH_SIZE)) {
+      console.log(`Updating ${batch.length} existing reciters`);
+      
+      const { error: updateError } = await supabase
+        .from('reciters')
+        .upsert(batch, { onConflict: 'id' });
+      
+      if (updateError) {
+        console.error(`Error updating reciters ${batch.map(r => r.name).join(', ')}:`, updateError);
+      } else {
+        console.log(`Updated ${batch.length} reciters successfully`);
+      }
+    }
+    
+    // Create new reciters
+    for (const batch of chunk(inserts, BATCH_SIZE)) {
+      console.log(`Creating ${batch.length} new reciters`);
+      
+      const { error: insertError } = await supabase
+        .from('reciters')
+        .insert(batch);
+      
+      if (insertError) {
+        console.error(`Error creating reciters ${batch.map(r => r.name).join(', ')}:`, insertError);
+      } else {
+        console.log(`Created ${batch.length} reciters successfully`);
       }
     }
     
@@ -0,0 +1,148 @@
+import io
+import os
+import sys
+
+import numpy as np
+import scipy.signal
+import soundfile as sf
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib', 'audio'))
+
+import python_processor  # noqa: E402
+
+
+def _full_dtw(cost):
+    # Unbanded reference DTW over the same cost matrix
+    n, m = cost.shape
+    acc = np.full((n + 1, m + 1), np.inf)
+    acc[0, 0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            acc[i, j] = cost[i - 1, j - 1] + min(acc[i - 1, j], acc[i, j - 1], acc[i - 1, j - 1])
+    return acc[n, m]
+
+
+def test_dtw_banded_with_wide_band_matches_full_dtw():
+    rng = np.random.default_rng(0)
+    for n, m in [(1, 1), (5, 9), (30, 30), (40, 25)]:
+        cost = rng.random((n, m))
+
+        assert np.isclose(python_processor.dtw_banded(cost, max(n, m)), _full_dtw(cost))
+
+
+def test_dtw_banded_zero_band_still_reaches_corner():
+    cost = np.random.default_rng(1).random((12, 20))
+
+    distance = python_processor.dtw_banded(cost, 0)
+
+    assert np.isfinite(distance)
+    assert distance >= _full_dtw(cost)
+
+
+def test_compare_segments_scores_zero_segment_as_zero():
+    # An all-zero segment has no cosine direction; it must not poison the assignment
+    reference = [[0.0] * 13, list(range(1, 14)), list(range(2, 15))]
+    query = [list(range(1, 14)), list(range(3, 16))]
+
+    similarity = python_processor.compare_segments(reference, query)
+
+    assert np.isfinite(similarity)
+    assert abs(similarity - 0.9995274420060813) < 1e-9
+
+
+def test_compare_segments_handles_overflowing_segment():
+    reference = [[1e308] * 13, list(range(1, 14))]
+    query = [list(range(1, 14))]
+
+    similarity = python_processor.compare_segments(reference, query)
+
+    assert abs(similarity - 1.0) < 1e-9
+
+
+def _resonator_noise(sr, freq):
+    # Noise through a single resonator at freq
+    pole = 0.99 * np.exp(2j * np.pi * freq / sr)
+    noise = np.random.default_rng(0).standard_normal(sr)
+    return scipy.signal.lfilter([1.0], np.poly([pole, pole.conjugate()]).real, noise).astype(np.float32)
+
+
+def test_extract_formants_is_zero_unless_estimating():
+    # Formants were always zero at baseline; stored catalog vectors depend on that
+    formants = python_processor.extract_formants(_resonator_noise(22050, 1000), 22050)
+
+    assert formants.shape[0] == 3 and formants.shape[1] > 0
+    assert not formants.any()
+
+
+def test_extract_formants_reports_nothing_for_silence():
+    formants = python_processor.extract_formants(np.zeros(22050, dtype=np.float32), 22050, estimate=True)
+
+    assert not formants.any()
+
+
+def test_extract_formants_finds_resonance():
+    # The lowest formant should sit on the 1 kHz resonance
+    formants = python_processor.extract_formants(_resonator_noise(22050, 1000), 22050, estimate=True)
+
+    assert abs(np.median(formants[0]) - 1000) < 100
+
+
+def test_create_sequence_features_accepts_float64():
+    rng = np.random.default_rng(0)
+    mfccs = rng.standard_normal((20, 50))
+    chroma = rng.random((12, 50))
+    pitch = rng.random(50) * 300
+
+    sequence = python_processor.create_sequence_features(mfccs, chroma, pitch)
+
+    assert sequence.shape == (24, 50)
+    np.testing.assert_allclose(sequence[-1], np.linalg.norm(mfccs, axis=0), rtol=1e-5)
+
+
+def test_process_audio_keeps_formant_features_at_zero():
+    # Formant estimation must not leak into feature_vector until the catalog is regenerated
+    sr = 22050
+    buf = io.BytesIO()
+    sf.write(buf, _resonator_noise(sr, 1000), sr, format='WAV')
+
+    result = python_processor.process_audio(buf.getvalue(), 'audio/wav', segment=False)
+
+    assert not python_processor._decode_array(result['formants']).any()
+    assert not any(result['feature_vector'][-4:-1])
+
+
+def _sample(rng, base, noise):
+    # Features dictionary in process_audio's encoding, near a shared base vector
+    vector = base + noise * rng.standard_normal(base.size)
+    n_frames = int(rng.integers(80, 160))
+    segments = [rng.standard_normal(13).tolist() for _ in range(int(rng.integers(0, 4)))]
+    return {
+        'feature_vector': (vector / np.linalg.norm(vector)).astype(np.float32).tolist(),
+        'sequence_features': python_processor._b64_npy(rng.standard_normal((27, n_frames)), np.float32),
+        'segments': segments,
+    }
+
+
+def test_batch_score_matches_two_stage_matcher():
+    rng = np.random.default_rng(2)
+    base = rng.standard_normal(64)
+    query = _sample(rng, base, 0.3)
+    query['segments'] = [rng.standard_normal(13).tolist() for _ in range(3)]
+    # Enough survivors to go through the worker pool, plus some that stop at Stage 1
+    catalog = [_sample(rng, base, noise) for noise in [0.3] * 20 + [3.0] * 6]
+    catalog_vectors = np.array([entry['feature_vector'] for entry in catalog])
+
+    expected = [python_processor.two_stage_matcher(query, entry) for entry in catalog]
+    assert {result['stage'] for result in expected} == {1, 2, 3}
+
+    for n_jobs in (1, 2):
+        results = python_processor.batch_score(catalog_vectors, catalog, query, n_jobs=n_jobs)
+
+        assert len(results) == len(expected)
+        for result, reference in zip(results, expected):
+            assert result.keys() == reference.keys()
+            for key, value in reference.items():
+                if isinstance(value, float):
+                    assert abs(result[key] - value) < 1e-6
+                else:
+                    assert result[key] == value